@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Convert the Karnataka shapefile to GeoParquet for fast startup loading
+"""
+
+import json
+import os
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pyogrio.raw import open_arrow
+from pyproj import CRS
+
+from shapefile_source import PARQUET_FILE, SHAPEFILE, SHAPEFILE_COLUMNS, extract_compressed_shapefiles
+
+# Features per Arrow batch; peak memory is bounded by one batch, not the file
+BATCH_SIZE = 50_000
+# Low-cardinality name columns, stored dictionary-encoded so they load back
+# as pandas categoricals
+DICTIONARY_COLUMNS = ('state_name', 'district_n', 'subdistric')
+
+def geoparquet_metadata(crs):
+    """GeoParquet 'geo' schema metadata for a single WKB geometry column"""
+    column = {
+        'encoding': 'WKB',
+        'geometry_types': [],
+        'crs': crs.to_json_dict() if crs is not None else None
+    }
+    return {b'geo': json.dumps({
+        'version': '1.0.0',
+        'primary_column': 'geometry',
+        'columns': {'geometry': column}
+    }).encode()}
+
+def main():
+    """Stream the shapefile in Arrow batches into GeoParquet"""
+    print("📦 Building GeoParquet from shapefile...")
+    extract_compressed_shapefiles()
+
+    count = 0
+    with open_arrow(SHAPEFILE, columns=SHAPEFILE_COLUMNS, batch_size=BATCH_SIZE) as (meta, reader):
+        crs = CRS.from_user_input(meta['crs']) if meta['crs'] else None
+
+        # GDAL hands geometries over as WKB already, which is exactly what
+        # GeoParquet stores; only the column name and metadata change
+        schema = reader.schema
+        geometry_index = schema.get_field_index(meta['geometry_name'] or 'wkb_geometry')
+        schema = schema.set(geometry_index, pa.field('geometry', schema.field(geometry_index).type))
+        dictionary_indices = [schema.get_field_index(name) for name in DICTIONARY_COLUMNS
+                              if schema.get_field_index(name) >= 0]
+        for i in dictionary_indices:
+            schema = schema.set(i, pa.field(schema.field(i).name, pa.dictionary(pa.int32(), schema.field(i).type)))
+        schema = schema.with_metadata(geoparquet_metadata(crs))
+
+        with pq.ParquetWriter(PARQUET_FILE, schema, compression='zstd', compression_level=7) as writer:
+            for batch in reader:
+                columns = batch.columns
+                for i in dictionary_indices:
+                    columns[i] = columns[i].dictionary_encode()
+                writer.write_batch(pa.RecordBatch.from_arrays(columns, schema=schema))
+                count += batch.num_rows
+                print(f"📥 Wrote {count} features...")
+
+    size = os.path.getsize(PARQUET_FILE) / (1024 * 1024)  # Size in MB
+    print(f"🎉 Wrote {PARQUET_FILE} ({count} features): {size:.1f} MB")
+
+if __name__ == "__main__":
+    main()
@@ -4,16 +4,50 @@ Compress shapefile components for GitHub upload
 """
 
 import gzip
+import mmap
 import shutil
 import os
+from concurrent.futures import ProcessPoolExecutor
 
-def compress_file(filename):
+try:
+    # libdeflate bindings: whole-buffer DEFLATE, faster than zlib's streaming API
+    import deflate
+except ImportError:
+    deflate = None
+
+try:
+    # Multi-threaded ISA-L writer, pigz-style: the output is still a
+    # standard gzip stream that stdlib gzip can decompress
+    from isal import igzip_threaded
+except ImportError:
+    igzip_threaded = None
+
+# zlib-style level (1-9). stdlib gzip defaults to 9, which is far slower
+# for a marginal gain in ratio on these files.
+COMPRESSLEVEL = int(os.environ.get("DEPLOY_COMPRESSLEVEL", 6))
+
+def compress_file(filename, threads=None):
     """Compress a file using gzip"""
     if os.path.exists(filename):
         compressed_name = filename + '.gz'
-        with open(filename, 'rb') as f_in:
-            with gzip.open(compressed_name, 'wb') as f_out:
-                shutil.copyfileobj(f_in, f_out)
+        if deflate is not None and os.path.getsize(filename) > 0:
+            # Components are at most ~100 MB: map the file and compress it in
+            # one call, with no chunked read loop or extra userspace copy
+            with open(filename, 'rb') as f_in, \
+                    mmap.mmap(f_in.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                compressed = deflate.gzip_compress(data, COMPRESSLEVEL)
+            with open(compressed_name, 'wb') as f_out:
+                f_out.write(compressed)
+            print(f"✅ Compressed {filename} -> {compressed_name}")
+            return compressed_name
+        if igzip_threaded is not None:
+            # ISA-L only has levels 0-3, so scale the zlib-style level down
+            f_out = igzip_threaded.open(compressed_name, 'wb', compresslevel=min(3, COMPRESSLEVEL // 3),
+                                        threads=threads or os.cpu_count() or 1)
+        else:
+            f_out = gzip.open(compressed_name, 'wb', compresslevel=COMPRESSLEVEL)
+        with open(filename, 'rb') as f_in, f_out:
+            shutil.copyfileobj(f_in, f_out)
         print(f"✅ Compressed {filename} -> {compressed_name}")
         return compressed_name
     else:
@@ -35,11 +69,12 @@ def main():
         'Karnataka.sbx'
     ]
     
-    compressed_files = []
-    for filename in files_to_compress:
-        compressed = compress_file(filename)
-        if compressed:
-            compressed_files.append(compressed)
+    # Each component is independent, so compress them in parallel and split
+    # the remaining cores between the per-file ISA-L writer threads
+    threads = max(1, (os.cpu_count() or 1) // len(files_to_compress))
+    with ProcessPoolExecutor() as executor:
+        results = executor.map(compress_file, files_to_compress, [threads] * len(files_to_compress))
+        compressed_files = [compressed for compressed in results if compressed]
     
     print(f"\n🎉 Compressed {len(compressed_files)} files:")
     for f in compressed_files:
@@ -3,23 +3,50 @@
 Data loader for Karnataka village data
 """
 
-import gzip
-import json
+import mmap
 import os
 
+import orjson
+
+try:
+    # ISA-L's igzip is a drop-in for stdlib gzip with a much faster inflate
+    from isal import igzip as gzip
+except ImportError:
+    import gzip
+
+try:
+    # libdeflate bindings: one-shot inflate of a whole in-memory buffer
+    import deflate
+except ImportError:
+    deflate = None
+
+DATA_FILE = "deployable_data.json.gz"
+
+def _read_json_gz(path):
+    """Decode a gzipped JSON file, inflating it in one pass when libdeflate is available"""
+    if deflate is not None:
+        with open(path, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                try:
+                    return orjson.loads(deflate.gzip_decompress(mm))
+                except Exception as e:
+                    # e.g. multi-member streams; the streaming reader handles those
+                    print(f"⚠️ libdeflate could not decode {path} ({e}), using gzip")
+    with gzip.open(path, "rb") as f:
+        return orjson.loads(f.read())
+
 def load_deployable_data():
     """Load deployable data from compressed JSON file"""
     try:
-        if os.path.exists("deployable_data.json.gz"):
-            with gzip.open("deployable_data.json.gz", "rt", encoding="utf-8") as f:
-                data = json.load(f)
-                print(f"📁 Loading data from: deployable_data.json.gz")
-                print(f"✅ Loaded {len(data.get('villages', []))} villages")
-                print(f"📊 Total population: {data.get('metadata', {}).get('total_population', 'Unknown'):,}")
-                print(f"🗺️ Districts: {data.get('metadata', {}).get('district_count', 'Unknown')}")
-                return data
+        if os.path.exists(DATA_FILE):
+            print(f"📁 Loading data from: {DATA_FILE}")
+            data = _read_json_gz(DATA_FILE)
+            print(f"✅ Loaded {len(data.get('villages', []))} villages")
+            print(f"📊 Total population: {data.get('metadata', {}).get('total_population', 'Unknown'):,}")
+            print(f"🗺️ Districts: {data.get('metadata', {}).get('district_count', 'Unknown')}")
+            return data
         else:
-            print("⚠️ deployable_data.json.gz not found")
+            print(f"⚠️ {DATA_FILE} not found")
             return None
     except Exception as e:
         print(f"❌ Error loading deployable data: {e}")
@@ -1,59 +1,318 @@
 import os
-import json
+import asyncio
+import glob
+import gzip
+import hashlib
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional
+import numpy as np
+import orjson
 import pandas as pd
 from fastapi import FastAPI, HTTPException
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import HTMLResponse, ORJSONResponse, Response
+from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException as StarletteHTTPException
 from fastapi import Request
 import uvicorn
 from pathlib import Path
 
-app = FastAPI(title="Karnataka Village Population Visualization")
+from shapefile_source import PARQUET_FILE, SHAPEFILE, SHAPEFILE_COLUMNS, extract_compressed_shapefiles
+
+# Geospatial stack, imported once at module load rather than inside the
+# loaders; without it the app falls back to the deployable/sample data
+try:
+    import geopandas as gpd
+    import shapely
+except ImportError:
+    gpd = None
+    shapely = None
+
+try:
+    import topojson
+except ImportError:
+    topojson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import h3
+except ImportError:
+    h3 = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+app = FastAPI(title="Karnataka Village Population Visualization", default_response_class=ORJSONResponse)
+
+# Routes that send bodies which are already compressed
+PRECOMPRESSED_PATHS = ("/api/data", "/data/")
+
+class DynamicGZipMiddleware(GZipMiddleware):
+    """Gzip dynamic responses, leaving pre-compressed routes untouched"""
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].startswith(PRECOMPRESSED_PATHS):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+app.add_middleware(DynamicGZipMiddleware, minimum_size=1024)
+
+class ImmutableStaticFiles(StaticFiles):
+    """Content-hashed static files: cached forever, served from a .br/.gz sibling the client accepts"""
+    async def get_response(self, path, scope):
+        accept_encoding = Headers(scope=scope).get("accept-encoding", "")
+        response = None
+        for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+            if encoding not in accept_encoding:
+                continue
+            try:
+                response = await super().get_response(path + suffix, scope)
+            except StarletteHTTPException:
+                continue
+            response.headers["Content-Encoding"] = encoding
+            response.headers["Content-Type"] = "application/json"
+            break
+        if response is None:
+            response = await super().get_response(path, scope)
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        response.headers["Vary"] = "Accept-Encoding"
+        return response
+
+# /api/data body published as a content-hashed file; data_url is handed to
+# the page once it exists
+STATIC_DATA_DIR = "build"
+data_url = None
+app.mount("/data", ImmutableStaticFiles(directory=STATIC_DATA_DIR, check_dir=False), name="data")
 
 # Templates
 templates = Jinja2Templates(directory="templates")
+# Rendered index.html, keyed by the data_url it was rendered with
+index_pages = {}
 
 # Global variables for caching
 gdf = None
 population_stats = None
 topojson_data = None
 
-def extract_compressed_shapefiles():
-    """Extract compressed shapefiles for processing"""
-    import gzip
-    import shutil
-    import os
-    
-    print("🗜️ Extracting compressed shapefiles...")
-    
-    # Files to extract
-    files_to_extract = [
-        'Karnataka.shp.gz',
-        'Karnataka.shx.gz', 
-        'Karnataka.dbf.gz',
-        'Karnataka.prj.gz',
-        'Karnataka.cpg.gz',
-        'Karnataka.sbn.gz',
-        'Karnataka.sbx.gz'
-    ]
+# /api/villages records and the row positions of each district/subdistrict
+# in them, built once the data is loaded
+village_records = []
+villages_by_district = {}
+villages_by_subdistrict = {}
+villages_by_pair = {}
+district_list = []
+district_aggregates = []
+
+# WGS84 bounds of each village (rows aligned with village_records) and the
+# STRtree over them for bounding-box queries
+village_bounds = None
+village_tree = None
+
+# H3 resolutions binned for zoomed-out views, and the encoded
+# FeatureCollection of bins for each
+H3_RESOLUTIONS = (4, 6, 8)
+h3_bins = {}
+
+# Set once the background data load has finished (successfully or not)
+data_ready = threading.Event()
+data_load_task = None
+
+# Fully encoded /api/data response body, plus its compressed variants
+api_data_bytes = None
+api_data_gzip = None
+api_data_br = None
+
+# Frame column -> /api/villages field
+API_VILLAGE_COLUMNS = {
+    'village_na': 'village_name',
+    'district_n': 'district',
+    'subdistric': 'subdistrict',
+    'tot_p': 'population',
+    'pc11_tv_id': 'census_id'
+}
+
+# Processed shapefile output is cached here between restarts. Bump
+# CACHE_VERSION whenever the cached payload's layout or meaning changes.
+PROCESSED_CACHE_DIR = "cache"
+CACHE_VERSION = 2
+
+# /api/data compression levels. The bodies are built during startup on every
+# path not served from the processed cache, and the top levels cost far more
+# than they save there: brotli 11 takes ~2 minutes on the ~41 MB payload
+# against ~1.3 s at 5, gzip 9 ~4.4 s against ~1.7 s at 6
+API_DATA_GZIP_LEVEL = 6
+API_DATA_BROTLI_QUALITY = 5
+
+# TopoJSON quantization grid (number of steps across the data's extent)
+TOPOJSON_QUANTIZATION = 65535  # 16-bit grid
+# Shared-border detection: stores each border between villages once, but is
+# ~100 s of the cold load (which is why the deploy build fills the cache)
+TOPOJSON_SHARED_ARCS = True
+
+# Geometry simplification tolerance, in the shapefile's units
+SIMPLIFY_TOLERANCE = 0.0001
+
+# Sample data tables, built once at import rather than on every call
+SAMPLE_CENTER = (15.3173, 75.7139)  # Karnataka center
+
+# Sample villages with realistic names
+SAMPLE_VILLAGE_NAMES = (
+    "Bangalore Rural", "Mysore Central", "Mangalore Coastal", "Hubli Industrial",
+    "Belgaum Northern", "Gulbarga Eastern", "Bellary Mining", "Raichur Agricultural",
+    "Bidar Historical", "Koppal Traditional", "Gadag Cultural", "Dharwad Educational",
+    "Haveri Agricultural", "Davangere Industrial", "Shimoga Forest", "Udupi Coastal",
+    "Chikmagalur Coffee", "Tumkur Industrial", "Kolar Gold", "Mandya Sugar"
+)
+
+SAMPLE_DISTRICTS = (
+    "Bangalore", "Mysore", "Mangalore", "Hubli", "Belgaum", "Gulbarga",
+    "Bellary", "Raichur", "Bidar", "Koppal", "Gadag", "Dharwad", "Haveri",
+    "Davangere", "Shimoga", "Udupi", "Chikmagalur", "Tumkur", "Kolar", "Mandya"
+)
+
+def processing_settings_key():
+    """Short hash of every setting that changes what process_real_data produces"""
+    settings = [CACHE_VERSION, TOPOJSON_QUANTIZATION, TOPOJSON_SHARED_ARCS, SIMPLIFY_TOLERANCE,
+                list(H3_RESOLUTIONS), topojson is not None, h3 is not None]
+    return hashlib.sha256(orjson.dumps(settings)).hexdigest()[:12]
+
+def source_files():
+    """The files process_real_data would read, in the order load_and_process_data prefers them"""
+    if os.path.exists(PARQUET_FILE):
+        return [PARQUET_FILE]
+    stem = os.path.splitext(SHAPEFILE)[0]
+    for suffix in (".gz", ""):
+        if os.path.exists(f"{SHAPEFILE}{suffix}"):
+            return [path for path in (f"{stem}.{ext}{suffix}" for ext in ("shp", "dbf", "prj"))
+                    if os.path.exists(path)]
+    return []
+
+def processed_cache_path():
+    """Path of the processed-data cache for the current source data and processing settings"""
+    sources = source_files()
+    if not sources:
+        return None
+    
+    # Keyed on content rather than mtime, so a cache filled during the deploy
+    # build still matches on a fresh checkout of the same data
+    digest = hashlib.sha256()
+    for source in sources:
+        with open(source, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+    name = f"karnataka_{digest.hexdigest()[:16]}_{processing_settings_key()}.json.zst"
+    return os.path.join(PROCESSED_CACHE_DIR, name)
+
+def prune_processed_caches(path):
+    """Remove caches (and their /api/data bodies) written for other shapefiles or settings"""
+    prefix = path[:-len(".json.zst")] + "."
+    for old_path in glob.glob(os.path.join(PROCESSED_CACHE_DIR, "karnataka_*")):
+        if not old_path.startswith(prefix):
+            os.remove(old_path)
+
+def encoded_map_data():
+    """The processed map payload as JSON bytes, whichever form it was produced in"""
+    if isinstance(topojson_data, bytes):
+        return topojson_data
+    if isinstance(topojson_data, str):
+        return topojson_data.encode()
+    return orjson.dumps(topojson_data, option=orjson.OPT_SERIALIZE_NUMPY)
+
+def save_processed_cache(path):
+    """Persist the processed map payload, village attributes and population stats so restarts skip GEOS work"""
+    if zstandard is None:
+        print("⚠️ zstandard not installed, not caching processed data")
+        return False
+    
+    map_data = encoded_map_data()
+    villages = gdf.drop(columns='geometry', errors='ignore').to_dict(orient='records')
+    payload = (b'{"population_stats":' + orjson.dumps(population_stats) +
+               b',"villages":' + orjson.dumps(villages, option=orjson.OPT_SERIALIZE_NUMPY) +
+               b',"bounds":' + (orjson.dumps(village_bounds, option=orjson.OPT_SERIALIZE_NUMPY)
+                                if village_bounds is not None else b'null') +
+               b',"h3_bins":{' + b','.join(b'"%d":%s' % (res, body) for res, body in h3_bins.items()) + b'}' +
+               b',"map_data":' + map_data + b'}')
+    # Never persist a payload that load_processed_cache couldn't read back
+    orjson.loads(payload)
+    
+    os.makedirs(PROCESSED_CACHE_DIR, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(zstandard.ZstdCompressor(level=3).compress(payload))
+    os.replace(tmp_path, path)
+    prune_processed_caches(path)
+    print(f"💾 Cached processed data to {path}")
+    return True
+
+def load_processed_cache(path):
+    """Load processed data written by save_processed_cache, skipping the shapefile entirely"""
+    global gdf, population_stats, topojson_data, h3_bins, village_bounds
+    
+    with open(path, "rb") as f:
+        cached = orjson.loads(zstandard.ZstdDecompressor().decompress(f.read()))
+    
+    topojson_data = cached['map_data']
+    village_bounds = np.asarray(cached['bounds']) if cached.get('bounds') else None
+    h3_bins = {int(res): orjson.dumps(bins) for res, bins in cached.get('h3_bins', {}).items()}
+    population_stats = cached['population_stats']
+    # The API endpoints only need the village attributes, not the geometry
+    gdf = apply_village_dtypes(pd.DataFrame(cached['villages']))
+    build_village_index()
+    # The encoded (and compressed) response is cached too, so the brotli/gzip
+    # passes only run once per shapefile version
+    if not load_api_data_cache(path):
+        encode_api_data()
+        save_api_data_cache(path)
+    publish_api_data()
+    print(f"✅ Loaded {len(gdf)} processed villages from cache {path}")
+    return True
+
+def api_data_cache_paths(path):
+    """Files next to a processed cache holding the /api/data body and its gzip/brotli variants"""
+    prefix = path[:-len(".json.zst")]
+    return f"{prefix}.api.json", f"{prefix}.api.json.gz", f"{prefix}.api.json.br"
+
+def save_api_data_cache(path):
+    """Write the encoded /api/data bodies built by encode_api_data"""
+    os.makedirs(PROCESSED_CACHE_DIR, exist_ok=True)
+    for variant_path, body in zip(api_data_cache_paths(path), (api_data_bytes, api_data_gzip, api_data_br)):
+        if body is None:
+            continue
+        tmp_path = f"{variant_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(body)
+        os.replace(tmp_path, variant_path)
+    print(f"💾 Cached /api/data response bodies next to {path}")
+    return True
+
+def load_api_data_cache(path):
+    """Read the /api/data bodies written by save_api_data_cache, if present"""
+    global api_data_bytes, api_data_gzip, api_data_br
+    
+    plain_path, gzip_path, br_path = api_data_cache_paths(path)
+    if not (os.path.exists(plain_path) and os.path.exists(gzip_path)):
+        return False
     
-    extracted_count = 0
-    for compressed_file in files_to_extract:
-        if os.path.exists(compressed_file):
-            # Extract the file
-            output_file = compressed_file.replace('.gz', '')
-            with gzip.open(compressed_file, 'rb') as f_in:
-                with open(output_file, 'wb') as f_out:
-                    shutil.copyfileobj(f_in, f_out)
-            print(f"✅ Extracted {compressed_file} -> {output_file}")
-            extracted_count += 1
-        else:
-            print(f"⚠️ Compressed file not found: {compressed_file}")
-    
-    print(f"🎉 Extracted {extracted_count} shapefile components")
-    return extracted_count > 0
+    with open(plain_path, "rb") as f:
+        api_data_bytes = f.read()
+    with open(gzip_path, "rb") as f:
+        api_data_gzip = f.read()
+    api_data_br = None
+    if os.path.exists(br_path):
+        with open(br_path, "rb") as f:
+            api_data_br = f.read()
+    print(f"✅ Loaded cached /api/data response ({len(api_data_bytes) / (1024 * 1024):.1f} MB)")
+    return True
 
 def load_and_process_data():
     """Load and process the Karnataka shapefile data with optimizations"""
@@ -63,71 +322,53 @@ def load_and_process_data():
     start_time = time.time()
     
     try:
-        # First try to load the real shapefile using fiona directly
+        # Reuse the output of a previous run if the shapefile hasn't changed
+        cache_path = processed_cache_path()
+        if cache_path and os.path.exists(cache_path):
+            try:
+                load_processed_cache(cache_path)
+                print(f"✅ Data loading completed in {time.time() - start_time:.2f} seconds")
+                return True
+            except orjson.JSONDecodeError as e:
+                # Written by a version that produced invalid JSON; it can
+                # never load, so drop it rather than failing on every start
+                print(f"❌ Processed cache {cache_path} is not valid JSON ({e}), discarding it and reprocessing")
+                os.remove(cache_path)
+            except Exception as e:
+                print(f"⚠️ Could not load processed cache: {e}")
+        
+        # First try to load the real shapefile
         try:
-            import fiona
-            import shapely
-            from shapely.geometry import shape
-            import pandas as pd
-            import geopandas as gpd
+            if gpd is None:
+                raise ImportError("geopandas is not installed")
             
-            print("📁 Attempting to load real shapefile using fiona...")
+            # Prefer the GeoParquet copy written by build_parquet.py: columnar,
+            # compressed and without any DBF parsing
+            if os.path.exists(PARQUET_FILE):
+                print(f"📁 Loading {PARQUET_FILE}...")
+                gdf = gpd.read_parquet(PARQUET_FILE, columns=SHAPEFILE_COLUMNS + ['geometry'])
+                print(f"✅ Successfully read GeoParquet with {len(gdf)} features")
+                print(f"📊 CRS: {gdf.crs}")
+                return process_real_data(gdf, start_time)
             
             # Check if we have compressed shapefiles and need to extract them
-            if os.path.exists("Karnataka.shp.gz") and not os.path.exists("Karnataka.shp"):
-                print("🗜️ Extracting compressed shapefiles...")
+            if os.path.exists(f"{SHAPEFILE}.gz"):
                 extract_compressed_shapefiles()
             
-            # Read the shapefile using fiona (just like local!)
-            with fiona.open("Karnataka.shp", "r") as src:
-                print(f"✅ Successfully opened shapefile with {len(src)} features")
-                print(f"📊 CRS: {src.crs}")
-                
-                # Convert to GeoDataFrame manually (same as local)
-                features = []
-                for feature in src:
-                    # Convert fiona feature to GeoJSON-like structure
-                    # Clean up properties to avoid duplicate column names
-                    properties = dict(feature['properties'])
-                    
-                    # Remove any duplicate or problematic columns
-                    if 'shrid2' in properties and 'shrid2_11' in properties:
-                        del properties['shrid2_11']  # Keep only one shrid2
-                    
-                    # Remove other potentially problematic columns
-                    problematic_cols = ['_mean_p_mi', '_core_p_mi', '_target_we', '_target_gr']
-                    for col in problematic_cols:
-                        if col in properties:
-                            del properties[col]
-                    
-                    geojson_feature = {
-                        'type': 'Feature',
-                        'properties': properties,
-                        'geometry': feature['geometry']
-                    }
-                    features.append(geojson_feature)
-                
-                # Create GeoDataFrame with explicit column handling
-                # Extract properties and geometry separately
-                properties_list = [f['properties'] for f in features]
-                geometries = [f['geometry'] for f in features]
-                
-                # Create DataFrame from properties
-                df = pd.DataFrame(properties_list)
-                
-                # Add geometry column
-                df['geometry'] = geometries
-                
-                # Create GeoDataFrame
-                gdf = gpd.GeoDataFrame(df, crs=src.crs)
-                print(f"✅ Converted to GeoDataFrame with {len(gdf)} features")
-                print(f"📊 Available columns: {list(gdf.columns)}")
-                
-                return process_real_data(gdf, start_time)
+            # pyogrio reads every feature in one vectorized GDAL/Arrow call,
+            # only for the columns the app uses, and returns a ready
+            # GeoDataFrame with the CRS set
+            print("📁 Attempting to load real shapefile using pyogrio...")
+            gdf = gpd.read_file(SHAPEFILE, engine="pyogrio", columns=SHAPEFILE_COLUMNS, use_arrow=True)
+            print(f"✅ Successfully read shapefile with {len(gdf)} features")
+            print(f"📊 CRS: {gdf.crs}")
+            print(f"📊 Available columns: {list(gdf.columns)}")
+            
+            return process_real_data(gdf, start_time)
                 
         except Exception as e:
-            print(f"⚠️ Could not load shapefile with fiona: {e}")
-            print("🔧 This might be due to Fiona compatibility issues")
+            print(f"⚠️ Could not load shapefile: {e}")
+            print("🔧 This might be due to GDAL/pyogrio compatibility issues")
             print("🔧 Trying to load sample data...")
         
         # Only fall back to sample data if absolutely necessary
@@ -139,26 +380,51 @@ def load_and_process_data():
             deployable_data = load_deployable_data()
             if deployable_data:
                 # Convert deployable data to the expected format
-                converted_data = convert_deployable_to_features(deployable_data)
-                gdf = create_sample_geodataframe(converted_data)
-                print(f"✅ Loaded deployable data with {len(gdf)} features")
-                return process_sample_data(gdf, start_time)
+                sample_data = convert_deployable_to_features(deployable_data)
+                print(f"✅ Loaded deployable data with {len(sample_data['features'])} features")
+                return process_sample_data(sample_data, start_time)
             else:
                 raise Exception("No deployable data found")
         except Exception as e:
             print(f"⚠️ Could not load deployable data: {e}")
             print("🔧 Falling back to basic sample data...")
-            gdf = create_sample_data()
-            print(f"✅ Created {len(gdf)} sample villages")
-            return process_sample_data(gdf, start_time)
+            sample_data = create_sample_data()
+            print(f"✅ Created {len(sample_data['features'])} sample villages")
+            return process_sample_data(sample_data, start_time)
         
     except Exception as e:
         print(f"❌ Error loading data: {str(e)}")
         return False
 
-def process_real_data(gdf, start_time):
+def compute_population_stats(populations):
+    """Min/max/mean/median of a population array, straight from NumPy"""
+    values = np.asarray(populations)
+    return {
+        'min': float(values.min()),
+        'max': float(values.max()),
+        'mean': float(values.mean()),
+        'median': float(np.median(values))
+    }
+
+def apply_village_dtypes(frame):
+    """Give the village columns their compact dtypes, on every load path"""
+    # A few dozen districts and a few hundred subdistricts repeat across every
+    # village row: keep them as integer codes into a small category table
+    for col in ('state_name', 'district_n', 'subdistric'):
+        if col in frame.columns:
+            frame[col] = frame[col].astype('category')
+    # Populations are never negative, and uint32 is half the size of the
+    # float64 to_numeric gives
+    if 'tot_p' in frame.columns:
+        frame['tot_p'] = pd.to_numeric(frame['tot_p'], errors='coerce').fillna(0).clip(lower=0).astype('uint32')
+    return frame
+
+def process_real_data(raw_gdf, start_time):
     """Process real shapefile data"""
-    global population_stats, topojson_data
+    global gdf, population_stats, topojson_data, village_bounds
+    
+    # Work on (and serve) the cleaned-up frame rather than the raw one
+    gdf = raw_gdf
     
     # Check and rename columns if needed
     expected_columns = ['state_name', 'district_n', 'subdistric', 'village_na', 'pc11_tv_id', 'tot_p']
@@ -166,41 +432,16 @@ def process_real_data(gdf, start_time):
     
     print(f"📊 Available columns: {actual_columns}")
     
-    # Handle potential column name variations with more precise matching
-    column_mapping = {}
-    for expected in expected_columns:
-        # First try exact match
-        if expected in actual_columns:
-            column_mapping[expected] = expected
-        else:
-            # Try partial matching only for specific cases
-            for actual in actual_columns:
-                if expected.lower() == actual.lower():
-                    column_mapping[expected] = actual
-                    break
-                elif expected == 'village_na' and actual == 'village_na':
-                    column_mapping[expected] = actual
-                    break
-                elif expected == 'district_n' and actual == 'district_n':
-                    column_mapping[expected] = actual
-                    break
-                elif expected == 'subdistric' and actual == 'subdistric':
-                    column_mapping[expected] = actual
-                    break
-                elif expected == 'state_name' and actual == 'state_name':
-                    column_mapping[expected] = actual
-                    break
-                elif expected == 'pc11_tv_id' and actual == 'pc11_tv_id':
-                    column_mapping[expected] = actual
-                    break
-                elif expected == 'tot_p' and actual == 'tot_p':
-                    column_mapping[expected] = actual
-                    break
+    # Match expected columns case-insensitively; rename maps actual -> expected
+    actual_by_lower = {col.lower(): col for col in actual_columns}
+    column_mapping = {actual_by_lower[col.lower()]: col for col in expected_columns
+                      if col not in actual_columns and col.lower() in actual_by_lower}
     
     print(f"🔗 Column mapping: {column_mapping}")
     
-    # Rename columns for consistency
-    gdf = gdf.rename(columns=column_mapping)
+    # Rename columns for consistency (a no-op when the names already match)
+    if column_mapping:
+        gdf = gdf.rename(columns=column_mapping)
     
     # Remove any duplicate columns that might cause issues
     print("🔧 Checking for duplicate columns...")
@@ -222,254 +463,390 @@ def process_real_data(gdf, start_time):
                 continue  # Skip geometry, it should already exist
             gdf[col] = 'Unknown' if 'name' in col else 0
     
-    # Ensure population column exists and is numeric
-    if 'tot_p' in gdf.columns:
-        gdf['tot_p'] = pd.to_numeric(gdf['tot_p'], errors='coerce').fillna(0)
-    else:
+    # Ensure population column exists
+    if 'tot_p' not in gdf.columns:
         # Try to find population column
         pop_columns = [col for col in gdf.columns if 'pop' in col.lower() or 'tot' in col.lower()]
-        if pop_columns:
-            gdf['tot_p'] = pd.to_numeric(gdf[pop_columns[0]], errors='coerce').fillna(0)
-        else:
-            gdf['tot_p'] = 1000  # Default population for testing
+        gdf['tot_p'] = gdf[pop_columns[0]] if pop_columns else 1000  # Default population for testing
+    gdf = apply_village_dtypes(gdf)
     
     # Calculate population statistics for color scaling
-    population_stats = {
-        'min': float(gdf['tot_p'].min()),
-        'max': float(gdf['tot_p'].max()),
-        'mean': float(gdf['tot_p'].mean()),
-        'median': float(gdf['tot_p'].median())
-    }
+    population_stats = compute_population_stats(gdf['tot_p'].to_numpy())
     
     print(f"📊 Population stats: {population_stats}")
     
-    # Simplify geometries for faster rendering (reduce complexity by 50%)
+    # Simplify geometries for faster rendering (reduce complexity by 50%).
+    # shapely 2's simplify is a C loop that releases the GIL, so one chunk
+    # per core runs in parallel on threads.
     print("🔧 Simplifying geometries...")
-    gdf['geometry'] = gdf['geometry'].simplify(tolerance=0.0001, preserve_topology=True)
+    chunks = np.array_split(np.asarray(gdf.geometry.values), os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=len(chunks)) as executor:
+        geometries = np.concatenate(list(executor.map(
+            lambda chunk: shapely.simplify(chunk, tolerance=SIMPLIFY_TOLERANCE, preserve_topology=True), chunks)))
+    gdf['geometry'] = gpd.GeoSeries(geometries, index=gdf.index, crs=gdf.crs)
+    
+    web_gdf = gdf.to_crs(epsg=4326)
+    village_bounds = shapely.bounds(np.asarray(web_gdf.geometry.values))
+    build_h3_bins(web_gdf)
+    
+    if topojson is not None:
+        # Real TopoJSON: shared village borders are stored once as arcs and
+        # coordinates are quantized to a 16-bit integer grid (roughly 12 m
+        # across Karnataka's ~7 degree extent) and delta-encoded along each
+        # arc, which shrinks the payload several times over
+        print("💾 Converting to TopoJSON...")
+        topology = topojson.Topology(web_gdf, prequantize=TOPOJSON_QUANTIZATION, topology=TOPOJSON_SHARED_ARCS)
+        topojson_data = encode_topology(topology)
+    else:
+        # Encode the WGS84 GeoJSON once, as bytes
+        print("💾 Converting to GeoJSON...")
+        topojson_data = encode_feature_collection(web_gdf)
     
-    # Convert to TopoJSON for efficient transmission
-    print("💾 Converting to TopoJSON...")
-    topojson_data = gdf.to_crs(epsg=4326).to_json()
+    build_village_index()
+    encode_api_data()
+    publish_api_data()
+    
+    cache_path = processed_cache_path()
+    if cache_path:
+        try:
+            save_processed_cache(cache_path)
+            save_api_data_cache(cache_path)
+        except Exception as e:
+            print(f"❌ Could not cache processed data: {e}")
     
     total_time = time.time() - start_time
     print(f"✅ Data processing completed in {total_time:.2f} seconds")
     
     return True
 
-def create_sample_data():
-    """Create sample village data"""
-    import numpy as np
-    
-    # Sample coordinates around Karnataka
-    base_coords = [15.3173, 75.7139]  # Karnataka center
+def encode_topology(topology):
+    """Encode a topojson Topology as JSON bytes.
+    
+    Topology.to_json goes through the stdlib encoder, which writes missing
+    values (NaN in the categorical name columns) as bare NaN tokens that
+    JSON.parse rejects; orjson writes them as null.
+    """
+    return orjson.dumps(topology.to_dict(), option=orjson.OPT_SERIALIZE_NUMPY,
+                        default=lambda value: value.tolist())
+
+def h3_cell_polygon(cell):
+    """GeoJSON polygon of an H3 cell (cell_to_boundary gives an open ring of (lat, lng) pairs)"""
+    ring = [[lng, lat] for lat, lng in h3.cell_to_boundary(cell)]
+    return {'type': 'Polygon', 'coordinates': [ring + ring[:1]]}
+
+def build_h3_bins(web_gdf):
+    """Sum village populations into H3 hexagons at each of H3_RESOLUTIONS"""
+    global h3_bins
     
-    sample_data = {
-        'type': 'FeatureCollection',
-        'features': []
-    }
+    if h3 is None:
+        print("⚠️ h3 not installed, skipping population bins")
+        return False
     
-    # Create sample villages with realistic names
-    village_names = [
-        "Bangalore Rural", "Mysore Central", "Mangalore Coastal", "Hubli Industrial",
-        "Belgaum Northern", "Gulbarga Eastern", "Bellary Mining", "Raichur Agricultural",
-        "Bidar Historical", "Koppal Traditional", "Gadag Cultural", "Dharwad Educational",
-        "Haveri Agricultural", "Davangere Industrial", "Shimoga Forest", "Udupi Coastal",
-        "Chikmagalur Coffee", "Tumkur Industrial", "Kolar Gold", "Mandya Sugar"
+    centroids = shapely.centroid(np.asarray(web_gdf.geometry.values))
+    lngs = shapely.get_x(centroids)
+    lats = shapely.get_y(centroids)
+    populations = web_gdf['tot_p'].to_numpy()
+    
+    h3_bins = {}
+    for res in H3_RESOLUTIONS:
+        cells = pd.Series([h3.latlng_to_cell(lat, lng, res) for lat, lng in zip(lats, lngs)])
+        bins = pd.Series(populations).groupby(cells).agg(['sum', 'size'])
+        features = [
+            {
+                'type': 'Feature',
+                'id': cell,
+                'geometry': h3_cell_polygon(cell),
+                'properties': {'tot_p': int(total), 'villages': int(count)}
+            }
+            for cell, total, count in zip(bins.index, bins['sum'], bins['size'])
+        ]
+        h3_bins[res] = orjson.dumps({'type': 'FeatureCollection', 'features': features})
+        print(f"⬡ Built {len(features)} H3 bins at resolution {res}")
+    return True
+
+def encode_feature_collection(frame):
+    """Encode a GeoDataFrame as GeoJSON FeatureCollection bytes.
+    
+    Geometries are serialized by GEOS in one vectorized call and properties by
+    orjson, then the pre-encoded fragments are joined, so no per-feature
+    __geo_interface__ dicts are ever built.
+    """
+    geometries = shapely.to_geojson(np.asarray(frame.geometry.values))
+    records = frame.drop(columns=frame.geometry.name).to_dict(orient='records')
+    
+    features = [
+        b'{"id":' + orjson.dumps(str(idx)) +
+        b',"type":"Feature","properties":' + orjson.dumps(props, option=orjson.OPT_SERIALIZE_NUMPY) +
+        b',"geometry":' + (geometry.encode() if geometry is not None else b'null') + b'}'
+        for idx, props, geometry in zip(frame.index, records, geometries)
     ]
+    return b'{"type":"FeatureCollection","features":[' + b','.join(features) + b']}'
+
+def create_sample_data(count=100):
+    """Create sample village data"""
+    # Seeded so restarts serve the same villages; all draws in one call each
+    rng = np.random.default_rng(42)
+    lats = SAMPLE_CENTER[0] + rng.uniform(-2, 2, count)
+    lons = SAMPLE_CENTER[1] + rng.uniform(-2, 2, count)
+    populations = rng.integers(500, 15000, count).tolist()  # Realistic population range
     
-    districts = [
-        "Bangalore", "Mysore", "Mangalore", "Hubli", "Belgaum", "Gulbarga", 
-        "Bellary", "Raichur", "Bidar", "Koppal", "Gadag", "Dharwad", "Haveri",
-        "Davangere", "Shimoga", "Udupi", "Chikmagalur", "Tumkur", "Kolar", "Mandya"
-    ]
+    # Simple square polygon around each village, built as one (count, 5, 2) array
+    size = 0.01
+    corners = np.array([[-1, -1], [1, -1], [1, 1], [-1, 1], [-1, -1]]) * size
+    rings = (np.stack([lons, lats], axis=-1)[:, None, :] + corners).tolist()
     
-    for i in range(100):
-        # Create random village locations around Karnataka
-        lat = base_coords[0] + np.random.uniform(-2, 2)
-        lon = base_coords[1] + np.random.uniform(-2, 2)
-        
-        # Create simple polygon (square)
-        size = 0.01
-        coords = [
-            [lon - size, lat - size],
-            [lon + size, lat - size],
-            [lon + size, lat + size],
-            [lon - size, lat + size],
-            [lon - size, lat - size]
-        ]
-        
-        # Select village and district names
-        village_idx = i % len(village_names)
-        district_idx = i % len(districts)
-        
-        feature = {
-            'type': 'Feature',
-            'geometry': {
-                'type': 'Polygon',
-                'coordinates': [coords]
-            },
-            'properties': {
-                'state_name': 'Karnataka',
-                'village_na': f"{village_names[village_idx]} {i+1}",
-                'district_n': districts[district_idx],
-                'subdistric': f"Subdistrict {i//5 + 1}",
-                'pc11_tv_id': f"CENSUS_{i+1:04d}",
-                'tot_p': np.random.randint(500, 15000)  # Realistic population range
+    # Names and districts cycle through the sample tables
+    names = [SAMPLE_VILLAGE_NAMES[i % len(SAMPLE_VILLAGE_NAMES)] for i in range(count)]
+    districts = [SAMPLE_DISTRICTS[i % len(SAMPLE_DISTRICTS)] for i in range(count)]
+    
+    sample_data = {
+        'type': 'FeatureCollection',
+        'features': [
+            {
+                'type': 'Feature',
+                'geometry': {
+                    'type': 'Polygon',
+                    'coordinates': [rings[i]]
+                },
+                'properties': {
+                    'state_name': 'Karnataka',
+                    'village_na': f"{names[i]} {i+1}",
+                    'district_n': districts[i],
+                    'subdistric': f"Subdistrict {i//5 + 1}",
+                    'pc11_tv_id': f"CENSUS_{i+1:04d}",
+                    'tot_p': populations[i]
+                }
             }
-        }
-        
-        sample_data['features'].append(feature)
+            for i in range(count)
+        ]
+    }
     
     # Save sample data
-    with open("sample_data.json", "w") as f:
-        json.dump(sample_data, f)
+    with open("sample_data.json", "wb") as f:
+        f.write(orjson.dumps(sample_data, option=orjson.OPT_SERIALIZE_NUMPY))
     
-    return create_sample_geodataframe(sample_data)
+    return sample_data
 
 def convert_deployable_to_features(deployable_data):
     """Convert deployable data format to features format"""
     if 'villages' not in deployable_data:
         raise ValueError("Deployable data does not contain 'villages' key")
     
-    # Convert villages to features format
-    features = []
-    for village in deployable_data['villages']:
-        # Use the actual geometry from the data
-        feature = {
+    fallback_geometry = {
+        'type': 'Polygon',
+        'coordinates': [[[0, 0], [0, 1], [1, 1], [1, 0], [0, 0]]]
+    }
+    
+    # Convert villages to features format in one pass (the village count is
+    # known up front, so there is no reason to grow the list by appending)
+    features = [
+        {
             'type': 'Feature',
-            'geometry': village.get('geometry', {
-                'type': 'Polygon',
-                'coordinates': [[[0, 0], [0, 1], [1, 1], [1, 0], [0, 0]]]  # Fallback
-            }),
+            # Use the actual geometry from the data
+            'geometry': village.get('geometry', fallback_geometry),
             'properties': {
                 'state_name': 'Karnataka',
                 'village_na': village.get('name', 'Unknown'),
                 'district_n': village.get('district', 'Unknown'),
-                'subdistrict': village.get('subdistrict', 'Unknown'),
+                'subdistric': village.get('subdistrict', 'Unknown'),
                 'pc11_tv_id': village.get('census_id', 'Unknown'),
                 'tot_p': village.get('population', 1000)
             }
         }
-        features.append(feature)
+        for village in deployable_data['villages']
+    ]
     
     return {
         'type': 'FeatureCollection',
         'features': features
     }
 
-def create_sample_geodataframe(sample_data):
-    """Convert sample data to GeoDataFrame-like structure"""
-    # Create a simple structure that mimics GeoDataFrame
-    class SampleGeoDataFrame:
-        def __init__(self, data):
-            self.data = data
-            self.features = data['features']
-        
-        def __len__(self):
-            return len(self.features)
-        
-        @property
-        def columns(self):
-            return ['state_name', 'village_na', 'district_n', 'subdistric', 'pc11_tv_id', 'tot_p']
-        
-        def rename(self, columns):
-            # Simple rename implementation
-            return self
-        
-        def to_crs(self, epsg):
-            # Simple CRS conversion
-            return self
-        
-        def to_json(self):
-            return json.dumps(self.data)
-    
-    return SampleGeoDataFrame(sample_data)
+def create_sample_geodataframe(features):
+    """Build the columnar village frame for sample features (attributes only without geopandas)"""
+    if gpd is not None:
+        frame = gpd.GeoDataFrame.from_features(features)
+    else:
+        frame = pd.DataFrame([f['properties'] for f in features])
+    return apply_village_dtypes(frame)
+
+def geographic_bounds(frame):
+    """Per-village (minx, miny, maxx, maxy) in lon/lat, or None when they can't be had"""
+    if 'geometry' not in frame.columns:
+        return None
+    if frame.crs is not None:
+        return frame.to_crs(epsg=4326).bounds.to_numpy()
+    
+    # Frames built from features carry no CRS; the deployable data is in
+    # projected metres, which a lon/lat bbox query would never match
+    bounds = frame.bounds.to_numpy()
+    lons, lats = bounds[:, [0, 2]], bounds[:, [1, 3]]
+    if not ((np.abs(lons[~np.isnan(lons)]) <= 180).all() and (np.abs(lats[~np.isnan(lats)]) <= 90).all()):
+        print("⚠️ Village coordinates are not lon/lat, bounding-box queries are disabled")
+        return None
+    return bounds
 
-def process_sample_data(gdf, start_time):
+def process_sample_data(sample_data, start_time):
     """Process sample data"""
-    global population_stats, topojson_data
+    global gdf, population_stats, topojson_data, village_bounds
     
-    # Calculate population statistics (only for village features, not state boundary)
-    populations = []
-    for f in gdf.features:
-        if f['properties'].get('type') != 'state_boundary' and 'tot_p' in f['properties']:
-            populations.append(f['properties']['tot_p'])
+    # Only village features go into the frame, not the state boundary
+    features = [f for f in sample_data['features'] if f['properties'].get('type') != 'state_boundary']
+    gdf = create_sample_geodataframe(features)
     
-    if not populations:
+    if gdf.empty or 'tot_p' not in gdf.columns:
         print("⚠️ No population data found in village features")
-        populations = [1000]  # Default fallback
-    
-    population_stats = {
-        'min': float(min(populations)),
-        'max': float(max(populations)),
-        'mean': float(sum(populations) / len(populations)),
-        'median': float(sorted(populations)[len(populations)//2])
-    }
+        population_stats = compute_population_stats([1000])  # Default fallback
+    else:
+        population_stats = compute_population_stats(gdf['tot_p'].to_numpy())
     
     print(f"📊 Population stats: {population_stats}")
-    print(f"🏘️ Total features: {len(gdf.features)}")
-    print(f"👥 Village features with population: {len(populations)}")
+    print(f"🏘️ Total features: {len(sample_data['features'])}")
+    print(f"👥 Village features: {len(gdf)}")
     
-    # Convert to proper GeoJSON format for frontend
-    if hasattr(gdf, 'data'):
-        # Use the original data structure
-        topojson_data = gdf.data
-    else:
-        # Fallback to JSON conversion
-        topojson_data = gdf.to_json()
+    # The FeatureCollection is already in the format the frontend expects
+    topojson_data = sample_data
+    village_bounds = geographic_bounds(gdf)
+    
+    build_village_index()
+    encode_api_data()
+    publish_api_data()
     
     total_time = time.time() - start_time
     print(f"✅ Sample data processing completed in {total_time:.2f} seconds")
     
     return True
 
+def build_village_index():
+    """Precompute the village records and district lookups served by the API"""
+    global village_records, villages_by_district, villages_by_subdistrict, villages_by_pair, district_list
+    global district_aggregates, village_tree
+    
+    # One columnar projection instead of a boxed Series per row
+    villages = gdf[list(API_VILLAGE_COLUMNS)].rename(columns=API_VILLAGE_COLUMNS)
+    villages['population'] = villages['population'].astype(int)
+    villages.insert(0, 'id', gdf.index)
+    village_records = villages.to_dict(orient='records')
+    
+    # Row positions into village_records for each filter value, grouped on
+    # the frame's (categorical) columns; observed=True keeps only the
+    # district/subdistrict pairs that actually occur
+    keys = pd.DataFrame({
+        'district': gdf['district_n'].values,
+        'subdistrict': gdf['subdistric'].values,
+        'population': gdf['tot_p'].values
+    })
+    villages_by_district = keys.groupby('district', observed=True).indices
+    villages_by_subdistrict = keys.groupby('subdistrict', observed=True).indices
+    villages_by_pair = keys.groupby(['district', 'subdistrict'], observed=True).indices
+    
+    district_list = sorted(villages_by_district)
+    
+    # Per-district population summary for /api/districts/agg
+    district_aggregates = keys.groupby('district', observed=True)['population'].agg(
+        pop_sum='sum', pop_mean='mean', pop_min='min', pop_max='max', count='size'
+    ).reset_index().to_dict(orient='records')
+    
+    # Bulk-loaded R-tree over the village bounding boxes
+    if shapely is not None and village_bounds is not None and len(village_bounds) == len(village_records):
+        village_tree = shapely.STRtree(shapely.box(*np.asarray(village_bounds).T))
+    else:
+        village_tree = None
+    print(f"🗂️ Indexed {len(village_records)} villages across {len(district_list)} districts")
+
+def encode_api_data():
+    """Encode the /api/data response once, splicing in the already-encoded map payload"""
+    global api_data_bytes, api_data_gzip, api_data_br
+    
+    columns = list(gdf.columns)
+    api_data_bytes = (b'{"topojson":' + encoded_map_data() +
+                      b',"population_stats":' + orjson.dumps(population_stats) +
+                      b',"village_count":' + orjson.dumps(len(gdf)) +
+                      b',"columns":' + orjson.dumps(columns) + b'}')
+    print(f"📦 Encoded /api/data response: {len(api_data_bytes) / (1024 * 1024):.1f} MB")
+    
+    # Compressed once, since every request reuses it
+    api_data_gzip = gzip.compress(api_data_bytes, compresslevel=API_DATA_GZIP_LEVEL, mtime=0)
+    api_data_br = brotli.compress(api_data_bytes, quality=API_DATA_BROTLI_QUALITY) if brotli is not None else None
+    print(f"🗜️ Compressed /api/data: gzip {len(api_data_gzip) / (1024 * 1024):.1f} MB"
+          + (f", brotli {len(api_data_br) / (1024 * 1024):.1f} MB" if api_data_br is not None else ""))
+
+async def load_data_in_background():
+    """Run the blocking data load in a worker thread, then open the API"""
+    try:
+        success = await asyncio.to_thread(load_and_process_data)
+        if not success:
+            print("Failed to load data. Please check the shapefile.")
+    finally:
+        data_ready.set()
+
+def require_data():
+    """Reject data requests with 503 while loading, 500 if loading failed"""
+    if not data_ready.is_set():
+        raise HTTPException(status_code=503, detail="Data is still loading", headers={"Retry-After": "2"})
+    if gdf is None:
+        raise HTTPException(status_code=500, detail="Data not loaded")
+
+def publish_api_data():
+    """Write the /api/data bodies to STATIC_DATA_DIR under a content-hash name"""
+    global data_url
+    
+    name = f"data-{hashlib.sha256(api_data_bytes).hexdigest()[:16]}.json"
+    path = os.path.join(STATIC_DATA_DIR, name)
+    os.makedirs(STATIC_DATA_DIR, exist_ok=True)
+    
+    # Files from earlier data versions are never referenced again
+    for old_path in glob.glob(os.path.join(STATIC_DATA_DIR, "data-*.json*")):
+        if not old_path.startswith(path):
+            os.remove(old_path)
+    
+    for variant_path, body in ((path, api_data_bytes), (f"{path}.gz", api_data_gzip), (f"{path}.br", api_data_br)):
+        if body is not None and not os.path.exists(variant_path):
+            tmp_path = f"{variant_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(body)
+            os.replace(tmp_path, variant_path)
+    
+    data_url = f"/data/{name}"
+    print(f"🔗 Published /api/data as {data_url}")
+    return True
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize data on startup"""
+    global data_load_task
+    
     print("Starting Karnataka Village Population Visualization...")
-    success = load_and_process_data()
-    if not success:
-        print("Failed to load data. Please check the shapefile.")
+    # Load in the background so the server (and its health check) answers
+    # immediately instead of only once processing is done
+    data_load_task = asyncio.create_task(load_data_in_background())
 
 @app.get("/", response_class=HTMLResponse)
-async def root(request: Request):
+async def root():
     """Main page"""
-    return templates.TemplateResponse("index.html", {"request": request})
+    # The page only depends on data_url, so it is rendered once per value
+    html = index_pages.get(data_url)
+    if html is None:
+        html = index_pages[data_url] = templates.get_template("index.html").render(data_url=data_url)
+    return HTMLResponse(content=html)
 
 @app.get("/api/data")
-async def get_data():
+async def get_data(request: Request):
     """Get the processed data"""
-    if gdf is None or topojson_data is None or population_stats is None:
-        raise HTTPException(status_code=500, detail="Data not loaded")
-    
-    # Ensure the data is properly formatted
-    try:
-        # Get the data in the right format
-        if hasattr(gdf, 'data'):
-            # Use the original data structure from SampleGeoDataFrame
-            data_for_frontend = gdf.data
-        else:
-            # Parse the JSON if it's a string
-            if isinstance(topojson_data, str):
-                data_for_frontend = json.loads(topojson_data)
-            else:
-                data_for_frontend = topojson_data
-        
-        # Verify the data structure
-        if 'features' not in data_for_frontend:
-            raise ValueError("Data does not contain 'features'")
-        
-        print(f"📤 Sending {len(data_for_frontend['features'])} features to frontend")
-        
-        return {
-            "topojson": data_for_frontend,
-            "population_stats": population_stats,
-            "village_count": len(gdf),
-            "columns": list(gdf.columns) if hasattr(gdf, 'columns') else ['village_na', 'district_n', 'subdistric', 'pc11_tv_id', 'tot_p']
-        }
-    except Exception as e:
-        print(f"Error formatting data: {e}")
-        raise HTTPException(status_code=500, detail=f"Data formatting error: {str(e)}")
+    require_data()
+    
+    print(f"📤 Sending {len(gdf)} villages to frontend")
+    
+    # Served as-is: no parse/re-encode round trip per request, and the
+    # compressed variants were produced once at startup
+    accept_encoding = request.headers.get("accept-encoding", "")
+    headers = {"Vary": "Accept-Encoding"}
+    if api_data_br is not None and "br" in accept_encoding:
+        headers["Content-Encoding"] = "br"
+        return Response(content=api_data_br, media_type="application/json", headers=headers)
+    if "gzip" in accept_encoding:
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=api_data_gzip, media_type="application/json", headers=headers)
+    return Response(content=api_data_bytes, media_type="application/json", headers=headers)
 
 @app.get("/api/villages")
 async def get_villages(
@@ -478,91 +855,78 @@ async def get_villages(
     limit: int = 100
 ):
     """Get village data with optional filtering"""
-    if gdf is None:
-        raise HTTPException(status_code=500, detail="Data not loaded")
+    require_data()
+    
+    if district and subdistrict:
+        rows = villages_by_pair.get((district, subdistrict), ())
+    elif district:
+        rows = villages_by_district.get(district, ())
+    elif subdistrict:
+        rows = villages_by_subdistrict.get(subdistrict, ())
+    else:
+        rows = None
     
-    # Handle both real and sample data
-    if hasattr(gdf, 'features'):
-        # Sample data - filter out state boundary features
-        filtered_features = [f for f in gdf.features if f['properties'].get('type') != 'state_boundary']
-        if district:
-            filtered_features = [f for f in filtered_features if f['properties']['district_n'] == district]
-        if subdistrict:
-            filtered_features = [f for f in filtered_features if f['properties']['subdistric'] == subdistrict]
-        
-        villages_data = []
-        for i, feature in enumerate(filtered_features[:limit]):
-            props = feature['properties']
-            villages_data.append({
-                'id': i,
-                'village_name': props.get('village_na', 'Unknown'),
-                'district': props.get('district_n', 'Unknown'),
-                'subdistrict': props.get('subdistric', 'Unknown'),
-                'population': int(props.get('tot_p', 0)),
-                'census_id': props.get('pc11_tv_id', 'Unknown')
-            })
-        
-        return {
-            "villages": villages_data,
-            "total": len(filtered_features),
-            "returned": len(villages_data)
-        }
+    if rows is None:
+        villages_data = village_records[:limit]
+        total = len(village_records)
     else:
-        # Real GeoDataFrame data
-        filtered_gdf = gdf.copy()
-        
-        if district:
-            filtered_gdf = filtered_gdf[filtered_gdf['district_n'] == district]
-        if subdistrict:
-            filtered_gdf = filtered_gdf[filtered_gdf['subdistric'] == subdistrict]
-        
-        # Convert to JSON with limited features for performance
-        villages_data = []
-        for idx, row in filtered_gdf.head(limit).iterrows():
-            villages_data.append({
-                'id': idx,
-                'village_name': row.get('village_na', 'Unknown'),
-                'district': row.get('district_n', 'Unknown'),
-                'subdistrict': row.get('subdistric', 'Unknown'),
-                'population': int(row.get('tot_p', 0)),
-                'census_id': row.get('pc11_tv_id', 'Unknown')
-            })
-        
-        return {
-            "villages": villages_data,
-            "total": len(filtered_gdf),
-            "returned": len(villages_data)
-        }
+        villages_data = [village_records[i] for i in rows[:limit]]
+        total = len(rows)
+    
+    return {
+        "villages": villages_data,
+        "total": total,
+        "returned": len(villages_data)
+    }
+
+@app.get("/api/villages/bbox")
+async def get_villages_in_bbox(minx: float, miny: float, maxx: float, maxy: float, limit: int = 1000):
+    """Get villages whose bounds intersect a lon/lat bounding box"""
+    require_data()
+    
+    if village_tree is None:
+        raise HTTPException(status_code=500, detail="Spatial index not available: village bounds are not in lon/lat")
+    
+    rows = np.sort(village_tree.query(shapely.box(minx, miny, maxx, maxy), predicate="intersects"))
+    villages_data = [village_records[i] for i in rows[:limit]]
+    return {
+        "villages": villages_data,
+        "total": len(rows),
+        "returned": len(villages_data)
+    }
 
 @app.get("/api/health")
 async def health_check():
     """Health check endpoint for Render deployment"""
     return {
-        "status": "healthy", 
+        "status": "healthy" if data_ready.is_set() else "loading",
         "timestamp": time.time(),
         "service": "Karnataka Village Population Visualization",
-        "data_loaded": gdf is not None
+        "data_loaded": data_ready.is_set() and gdf is not None
     }
 
 @app.get("/api/districts")
 async def get_districts():
     """Get list of districts"""
-    if gdf is None:
-        raise HTTPException(status_code=500, detail="Data not loaded")
+    require_data()
     
-    # Handle both real and sample data
-    if hasattr(gdf, 'features'):
-        # Sample data - filter out state boundary features
-        districts = []
-        for f in gdf.features:
-            if f['properties'].get('type') != 'state_boundary' and 'district_n' in f['properties']:
-                districts.append(f['properties']['district_n'])
-        districts = list(set(districts))
-    else:
-        # Real GeoDataFrame data
-        districts = gdf['district_n'].unique().tolist()
+    return {"districts": district_list}
+
+@app.get("/api/bins")
+async def get_bins(res: int = 6):
+    """Get H3 hexagon bins with summed population, for zoomed-out views"""
+    require_data()
+    
+    if res not in h3_bins:
+        raise HTTPException(status_code=404, detail=f"No bins at resolution {res}; available: {sorted(h3_bins)}")
+    return Response(content=h3_bins[res], media_type="application/json")
+
+@app.get("/api/districts/agg")
+async def get_district_aggregates():
+    """Get population totals per district, precomputed at load time"""
+    require_data()
     
-    return {"districts": sorted(districts)}
+    return {"districts": district_aggregates}
 
 if __name__ == "__main__":
     # Get port from environment variable (Render sets this)
@@ -4,22 +4,35 @@ Server-Ready Karnataka Village Population Visualization
 Uses deployable data files instead of large shapefiles for easy server deployment
 """
 
-import json
-import gzip
+import hashlib
+import os
+import sqlite3
+from functools import lru_cache
 from pathlib import Path
 from typing import Dict, Any, Optional
+import orjson
 import uvicorn
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, ORJSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 import numpy as np
 
+
+try:
+    # ISA-L's igzip is a drop-in for stdlib gzip with a much faster inflate
+    from isal import igzip as gzip
+    GZIP_LEVEL = 3  # igzip's highest level
+except ImportError:
+    import gzip
+    GZIP_LEVEL = 6
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Karnataka Village Population Visualization",
     description="Interactive map showing village boundaries with population-based coloring",
-    version="2.0.0"
+    version="2.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # Templates
@@ -30,6 +43,48 @@ village_data = None
 population_stats = None
 districts_list = []
 
+# /api/villages columns: an int16 code per village into the sorted,
+# lowercased district names, and each village's lowercased name and
+# district joined by a unit separator (which a search string never
+# contains, so a match can't span the two)
+district_categories = {}
+district_codes = np.empty(0, dtype=np.int16)
+village_search_keys = np.empty(0, dtype=str)
+
+# Trigram FTS5 index over village_search_keys (rowid = village index), so
+# substring searches of 3+ characters don't scan every key. None when this
+# SQLite lacks FTS5 or the trigram tokenizer; searches then use the scan.
+search_index = None
+FTS_MIN_SEARCH = 3  # trigrams can't match anything shorter
+
+# /api/data FeatureCollection, encoded (and gzipped) once at startup
+feature_collection_bytes = None
+feature_collection_gzip = None
+
+# Decimals kept in /api/data coordinates: ~10 cm either way, 6 for degrees
+# and 1 for projected metres (the deployable data is in metres)
+coordinate_digits = None
+
+# /api/districts and /api/stats bodies, likewise encoded once
+districts_bytes = None
+stats_bytes = None
+
+# With STREAM_API_DATA=1 the FeatureCollection is never held in memory;
+# /api/data encodes it a batch of features at a time for every request.
+# Trades CPU per request for one payload less per worker.
+STREAM_API_DATA = os.environ.get("STREAM_API_DATA") == "1"
+STREAM_BATCH_SIZE = 1000
+
+# Version tag of the loaded data; /api/data, /api/districts and /api/stats
+# never change while it is loaded, so clients revalidate against it
+data_etag = None
+CACHE_CONTROL = "public, max-age=86400"
+
+# The main page only depends on the loaded data, so it is rendered once too
+index_html = None
+index_etag = None
+INDEX_CACHE_CONTROL = "public, max-age=3600"
+
 def load_deployable_data(data_file: str = None) -> Optional[Dict[str, Any]]:
     """
     Load deployable data from various formats
@@ -40,7 +95,8 @@ def load_deployable_data(data_file: str = None) -> Optional[Dict[str, Any]]:
             "deployable_data.json.gz",      # Compressed (best for deployment)
             "deployable_data.json",         # Full JSON
             "deployable_data_minimal.json", # Minimal JSON
-            "sample_data.json"              # Fallback sample data
+            "sample_data.json",             # Fallback sample data
+            "fallback_data.json"            # Written by create_fallback_data
         ]
         
         for file_path in possible_files:
@@ -55,14 +111,10 @@ def load_deployable_data(data_file: str = None) -> Optional[Dict[str, Any]]:
     try:
         print(f"📁 Loading data from: {data_file}")
         
-        if data_file.endswith('.gz'):
-            # Load compressed data
-            with gzip.open(data_file, 'rt', encoding='utf-8') as f:
-                data = json.load(f)
-        else:
-            # Load regular JSON
-            with open(data_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+        # One read and (for .gz) one in-memory inflate; orjson parses the
+        # UTF-8 bytes directly, no text-mode layer in between
+        raw = Path(data_file).read_bytes()
+        data = orjson.loads(gzip.decompress(raw) if data_file.endswith('.gz') else raw)
         
         print(f"✅ Loaded {data['metadata']['total_villages']} villages")
         print(f"📊 Total population: {data['metadata']['total_population']:,}")
@@ -74,9 +126,90 @@ def load_deployable_data(data_file: str = None) -> Optional[Dict[str, Any]]:
         print(f"❌ Error loading data: {e}")
         return None
 
+def round_coordinates(coordinates: list, digits: int) -> list:
+    """Round a GeoJSON coordinates array, one ring at a time"""
+    if not coordinates:
+        return coordinates
+    if isinstance(coordinates[0], (int, float)):
+        # A single position (Point)
+        return [round(value, digits) for value in coordinates]
+    if isinstance(coordinates[0][0], (int, float)):
+        return np.round(np.asarray(coordinates, dtype=np.float64), digits).tolist()
+    return [round_coordinates(part, digits) for part in coordinates]
+
+def detect_coordinate_digits(villages: list) -> Optional[int]:
+    """Pick the rounding for the data's units from the first coordinate's magnitude"""
+    for village in villages:
+        coordinates = (village.get('geometry') or {}).get('coordinates')
+        while isinstance(coordinates, list) and coordinates and isinstance(coordinates[0], list):
+            coordinates = coordinates[0]
+        if coordinates:
+            return 6 if abs(coordinates[0]) <= 180 else 1
+    return None
+
+def build_search_index(keys: np.ndarray) -> Optional[sqlite3.Connection]:
+    """Load the search keys into an in-memory, contentless trigram FTS5 table"""
+    try:
+        # Only touched from the event loop thread, never concurrently
+        conn = sqlite3.connect(":memory:", check_same_thread=False)
+        conn.execute("CREATE VIRTUAL TABLE villages USING fts5(key, tokenize='trigram', content='')")
+        conn.executemany("INSERT INTO villages(rowid, key) VALUES (?, ?)", enumerate(keys.tolist()))
+        return conn
+    except sqlite3.Error as e:
+        print(f"⚠️ SQLite FTS5 trigram search unavailable ({e}), using array scan")
+        return None
+
+def search_matches(search: str) -> Optional[np.ndarray]:
+    """Sorted indices of villages whose key contains search, or None to scan instead"""
+    if search_index is None or len(search) < FTS_MIN_SEARCH:
+        return None
+    phrase = '"%s"' % search.replace('"', '""')
+    rows = search_index.execute("SELECT rowid FROM villages WHERE villages MATCH ? ORDER BY rowid", (phrase,))
+    return np.fromiter((rowid for rowid, in rows), dtype=np.intp)
+
+def village_feature(village: Dict[str, Any]) -> Dict[str, Any]:
+    """GeoJSON Feature for one village"""
+    geometry = village['geometry']
+    if geometry and coordinate_digits is not None and 'coordinates' in geometry:
+        geometry = {"type": geometry['type'],
+                    "coordinates": round_coordinates(geometry['coordinates'], coordinate_digits)}
+    return {
+        "type": "Feature",
+        "id": village['id'],
+        "properties": {
+            "name": village['name'],
+            "district": village['district'],
+            "subdistrict": village['subdistrict'],
+            "population": village['population'],
+            "census_id": village['census_id']
+        },
+        "geometry": geometry
+    }
+
+def stream_feature_collection():
+    """Encode the FeatureCollection in batches, so only one batch is in memory"""
+    villages = village_data['villages']
+    yield b'{"type":"FeatureCollection","features":['
+    for start in range(0, len(villages), STREAM_BATCH_SIZE):
+        chunk = b",".join(orjson.dumps(village_feature(village))
+                          for village in villages[start:start + STREAM_BATCH_SIZE])
+        yield chunk if start == 0 else b"," + chunk
+    yield b']}'
+
+@lru_cache(maxsize=256)
+def district_indices(district_lower: str) -> np.ndarray:
+    """Indices of the villages in a (lowercased) district, computed once per district"""
+    code = district_categories.get(district_lower)
+    indices = np.flatnonzero(district_codes == code) if code is not None else np.empty(0, dtype=np.intp)
+    indices.flags.writeable = False  # shared between requests
+    return indices
+
 def initialize_data():
     """Initialize application data on startup"""
     global village_data, population_stats, districts_list
+    global feature_collection_bytes, feature_collection_gzip, data_etag
+    global index_html, index_etag, districts_bytes, stats_bytes, coordinate_digits
+    global district_categories, district_codes, village_search_keys, search_index
     
     print("🚀 Initializing Karnataka Village Visualization...")
     
@@ -89,6 +222,50 @@ def initialize_data():
     population_stats = data['metadata']['population_stats']
     districts_list = data['metadata']['districts']
     
+    villages = village_data['villages']
+    names, codes = np.unique([v['district'].lower() for v in villages], return_inverse=True)
+    district_categories = {name: code for code, name in enumerate(names.tolist())}
+    district_codes = codes.astype(np.int16)
+    village_search_keys = np.array([f"{v['name'].lower()}\x1f{v['district'].lower()}" for v in villages], dtype=str)
+    district_indices.cache_clear()
+    if search_index is not None:
+        search_index.close()
+    search_index = build_search_index(village_search_keys)
+    coordinate_digits = detect_coordinate_digits(villages)
+    
+    if STREAM_API_DATA:
+        # Hash the stream once for the ETag, without keeping it
+        digest = hashlib.blake2b(digest_size=16)
+        for chunk in stream_feature_collection():
+            digest.update(chunk)
+        data_etag = '"%s"' % digest.hexdigest()
+        feature_collection_bytes = feature_collection_gzip = None
+        print("📦 /api/data: streamed per request")
+    else:
+        # The dataset never changes while running, so /api/data is built once
+        feature_collection_bytes = orjson.dumps({
+            "type": "FeatureCollection",
+            "features": [village_feature(village) for village in village_data['villages']]
+        })
+        feature_collection_gzip = gzip.compress(feature_collection_bytes, compresslevel=GZIP_LEVEL)
+        data_etag = '"%s"' % hashlib.blake2b(feature_collection_bytes, digest_size=16).hexdigest()
+        print(f"📦 /api/data: {len(feature_collection_bytes) / 1024:.0f} KB, {len(feature_collection_gzip) / 1024:.0f} KB gzipped")
+    
+    districts_bytes = orjson.dumps({"districts": districts_list})
+    stats_bytes = orjson.dumps({
+        "population_stats": population_stats,
+        "total_villages": village_data['metadata']['total_villages'],
+        "total_population": village_data['metadata']['total_population'],
+        "districts_count": len(districts_list)
+    })
+    
+    index_html = templates.get_template("index.html").render(
+        total_villages=village_data['metadata']['total_villages'],
+        total_population=f"{village_data['metadata']['total_population']:,}",
+        districts_count=len(districts_list)
+    ).encode()
+    index_etag = '"%s"' % hashlib.blake2b(index_html, digest_size=16).hexdigest()
+    
     print(f"✅ Application initialized with {len(village_data['villages'])} villages")
     print(f"📊 Population range: {population_stats['min']:,} - {population_stats['max']:,}")
     print(f"🗺️ Districts: {', '.join(districts_list[:5])}{'...' if len(districts_list) > 5 else ''}")
@@ -108,55 +285,42 @@ def create_fallback_data():
     """Create fallback data if no deployable data is available"""
     print("🎯 Creating fallback sample data...")
     
-    # Generate 50 realistic sample villages
+    # Generate 50 realistic sample villages, drawing every column at once
+    count = 50
     districts = ['Bangalore Urban', 'Mysore', 'Mandya', 'Hassan', 'Tumkur']
-    sample_villages = []
+    rng = np.random.default_rng(0)
+    populations = rng.integers(100, 10000, count, dtype=np.int32)
+    lats = 12.9716 + (rng.random(count) - 0.5) * 2  # Around Bangalore
+    lons = 77.5946 + (rng.random(count) - 0.5) * 2
     
-    for i in range(50):
-        district = districts[i % len(districts)]
-        population = np.random.randint(100, 10000)
-        
-        # Create simple polygon (square around a point)
-        lat = 12.9716 + (np.random.random() - 0.5) * 2  # Around Bangalore
-        lon = 77.5946 + (np.random.random() - 0.5) * 2
-        
-        # Create a simple square polygon
-        square_size = 0.01
-        geometry = {
-            "type": "Polygon",
-            "coordinates": [[
-                [lon - square_size, lat - square_size],
-                [lon + square_size, lat - square_size],
-                [lon + square_size, lat + square_size],
-                [lon - square_size, lat + square_size],
-                [lon - square_size, lat - square_size]
-            ]]
-        }
-        
-        village_data = {
+    # Simple square polygon around each point, as one (count, 5, 2) array
+    square_size = 0.01
+    corners = np.array([[-1, -1], [1, -1], [1, 1], [-1, 1], [-1, -1]]) * square_size
+    rings = (np.stack([lons, lats], axis=-1)[:, None, :] + corners).tolist()
+    
+    sample_villages = [
+        {
             'id': i,
             'name': f'Sample_Village_{i+1}',
-            'district': district,
+            'district': districts[i % len(districts)],
             'subdistrict': f'Subdistrict_{i+1}',
             'population': population,
             'census_id': f'SAMPLE_{i+1:06d}',
-            'geometry': geometry
+            'geometry': {"type": "Polygon", "coordinates": [rings[i]]}
         }
-        sample_villages.append(village_data)
+        for i, population in enumerate(populations.tolist())
+    ]
     
-    # Calculate population statistics
-    populations = [v['population'] for v in sample_villages]
-    q1 = np.percentile(populations, 25)
-    q2 = np.percentile(populations, 50)
-    q3 = np.percentile(populations, 75)
+    # Calculate population statistics (one sort for all three quartiles)
+    q1, q2, q3 = np.percentile(populations, [25, 50, 75])
     
     fallback_data = {
         'metadata': {
             'total_villages': len(sample_villages),
-            'total_population': sum(populations),
+            'total_population': int(populations.sum()),
             'population_stats': {
-                'min': min(populations),
-                'max': max(populations),
+                'min': int(populations.min()),
+                'max': int(populations.max()),
                 'q1': float(q1),
                 'q2': float(q2),
                 'q3': float(q3)
@@ -170,53 +334,61 @@ def create_fallback_data():
     }
     
     # Save fallback data
-    with open("fallback_data.json", 'w', encoding='utf-8') as f:
-        json.dump(fallback_data, f, ensure_ascii=False, indent=2)
+    # Every worker that finds no data writes this file, so write it under a
+    # temporary name and rename it into place: no worker reads a partial file
+    tmp_file = f"fallback_data.json.{os.getpid()}.tmp"
+    with open(tmp_file, 'wb') as f:
+        f.write(orjson.dumps(fallback_data, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS))
+    os.replace(tmp_file, "fallback_data.json")
     
     print(f"✅ Fallback data created with {len(sample_villages)} villages")
 
+def is_not_modified(request: Request, etag: Optional[str] = None) -> bool:
+    """Whether the client's If-None-Match already names the loaded data version"""
+    etag = etag or data_etag
+    if_none_match = request.headers.get("if-none-match", "")
+    return etag is not None and etag in (tag.strip() for tag in if_none_match.split(","))
+
+def not_modified_response(etag: Optional[str] = None, cache_control: str = CACHE_CONTROL) -> Response:
+    """Empty 304 carrying the current validators"""
+    return Response(status_code=304, headers={"ETag": etag or data_etag, "Cache-Control": cache_control})
+
 @app.get("/", response_class=HTMLResponse)
 async def main_page(request: Request):
     """Main application page"""
-    return templates.TemplateResponse("index.html", {
-        "request": request,
-        "total_villages": village_data['metadata']['total_villages'],
-        "total_population": f"{village_data['metadata']['total_population']:,}",
-        "districts_count": len(districts_list)
-    })
+    if is_not_modified(request, index_etag):
+        return not_modified_response(index_etag, INDEX_CACHE_CONTROL)
+    return HTMLResponse(index_html, headers={"ETag": index_etag, "Cache-Control": INDEX_CACHE_CONTROL})
 
 @app.get("/api/data")
-async def get_village_data():
+async def get_village_data(request: Request):
     """Get complete village data for the map"""
-    if not village_data:
+    if not data_etag:
         raise HTTPException(status_code=500, detail="Data not loaded")
     
-    return {
-        "type": "FeatureCollection",
-        "features": [
-            {
-                "type": "Feature",
-                "id": village['id'],
-                "properties": {
-                    "name": village['name'],
-                    "district": village['district'],
-                    "subdistrict": village['subdistrict'],
-                    "population": village['population'],
-                    "census_id": village['census_id']
-                },
-                "geometry": village['geometry']
-            }
-            for village in village_data['villages']
-        ]
-    }
+    if is_not_modified(request):
+        return not_modified_response()
+    
+    if STREAM_API_DATA:
+        return StreamingResponse(stream_feature_collection(), media_type="application/json",
+                                 headers={"ETag": data_etag, "Cache-Control": CACHE_CONTROL})
+    
+    headers = {"ETag": data_etag, "Cache-Control": CACHE_CONTROL, "Vary": "Accept-Encoding"}
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=feature_collection_gzip, media_type="application/json", headers=headers)
+    return Response(content=feature_collection_bytes, media_type="application/json", headers=headers)
 
 @app.get("/api/districts")
-async def get_districts():
+async def get_districts(request: Request):
     """Get list of all districts"""
-    if not districts_list:
+    if not districts_bytes:
         raise HTTPException(status_code=500, detail="Data not loaded")
     
-    return {"districts": districts_list}
+    if is_not_modified(request):
+        return not_modified_response()
+    return Response(content=districts_bytes, media_type="application/json",
+                    headers={"ETag": data_etag, "Cache-Control": CACHE_CONTROL})
 
 @app.get("/api/villages")
 async def get_villages(search: str = "", district: str = ""):
@@ -226,33 +398,38 @@ async def get_villages(search: str = "", district: str = ""):
     
     villages = village_data['villages']
     
-    # Apply filters
+    # Apply filters as vectorized scans over the prebuilt columns
     if district:
-        villages = [v for v in villages if v['district'].lower() == district.lower()]
+        indices = district_indices(district.lower())
+    else:
+        indices = np.arange(len(villages))
     
     if search:
-        search_lower = search.lower()
-        villages = [v for v in villages if search_lower in v['name'].lower() or search_lower in v['district'].lower()]
+        matches = search_matches(search.lower())
+        if matches is None:
+            indices = indices[np.char.find(village_search_keys[indices], search.lower()) >= 0]
+        elif district:
+            indices = np.intersect1d(indices, matches, assume_unique=True)
+        else:
+            indices = matches
     
     # Return limited results for performance
     return {
-        "villages": villages[:100],  # Limit to 100 results
-        "total": len(villages),
-        "showing": min(100, len(villages))
+        "villages": [villages[i] for i in indices[:100]],  # Limit to 100 results
+        "total": len(indices),
+        "showing": min(100, len(indices))
     }
 
 @app.get("/api/stats")
-async def get_statistics():
+async def get_statistics(request: Request):
     """Get population statistics for color coding"""
-    if not population_stats:
+    if not stats_bytes:
         raise HTTPException(status_code=500, detail="Data not loaded")
     
-    return {
-        "population_stats": population_stats,
-        "total_villages": village_data['metadata']['total_villages'],
-        "total_population": village_data['metadata']['total_population'],
-        "districts_count": len(districts_list)
-    }
+    if is_not_modified(request):
+        return not_modified_response()
+    return Response(content=stats_bytes, media_type="application/json",
+                    headers={"ETag": data_etag, "Cache-Control": CACHE_CONTROL})
 
 @app.get("/api/health")
 async def health_check():
@@ -285,9 +462,14 @@ if __name__ == "__main__":
     print("🌐 Starting server at http://localhost:8000")
     print("📊 API documentation at http://localhost:8000/docs")
     
+    # Multiple workers need the app as an import string; each loads the data
+    # itself. "auto" picks uvloop and httptools, installed by uvicorn[standard].
     uvicorn.run(
-        app, 
-        host="0.0.0.0", 
+        "server_app:app",
+        host="0.0.0.0",
         port=8000,
-        log_level="info"
+        workers=int(os.environ.get("WEB_CONCURRENCY", max(2, os.cpu_count() or 1))),
+        loop="auto",
+        http="auto",
+        log_level="warning"
     )
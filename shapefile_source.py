@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Karnataka shapefile locations, shared by main.py and build_parquet.py
+"""
+
+import gzip
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+SHAPEFILE = "Karnataka.shp"
+
+# Optional GeoParquet copy of the shapefile (see build_parquet.py)
+PARQUET_FILE = "Karnataka.parquet"
+
+# Attribute columns read from the shapefile; everything else in the DBF is
+# never used, so it is not parsed at all
+SHAPEFILE_COLUMNS = ['state_name', 'district_n', 'subdistric', 'village_na', 'pc11_tv_id', 'tot_p']
+
+def extract_compressed_shapefiles():
+    """Extract compressed shapefiles for processing"""
+    print("🗜️ Extracting compressed shapefiles...")
+    
+    # Files to extract
+    files_to_extract = [
+        'Karnataka.shp.gz',
+        'Karnataka.shx.gz', 
+        'Karnataka.dbf.gz',
+        'Karnataka.prj.gz',
+        'Karnataka.cpg.gz',
+        'Karnataka.sbn.gz',
+        'Karnataka.sbx.gz'
+    ]
+    
+    # One directory scan instead of an exists() syscall per component
+    stats = {entry.name: entry.stat() for entry in os.scandir('.') if entry.name.startswith('Karnataka.')}
+    
+    def extract(compressed_file):
+        output_file = compressed_file.replace('.gz', '')
+        # Inflate next to the target and rename it into place, so an
+        # interrupted run never leaves a truncated file that is newer than
+        # its archive (and would be skipped as up to date from then on)
+        tmp_file = f"{output_file}.{os.getpid()}.tmp"
+        try:
+            with gzip.open(compressed_file, 'rb') as f_in:
+                with open(tmp_file, 'wb') as f_out:
+                    shutil.copyfileobj(f_in, f_out, length=1024 * 1024)
+            os.replace(tmp_file, output_file)
+        finally:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+        print(f"✅ Extracted {compressed_file} -> {output_file}")
+    
+    pending = []
+    available_count = 0
+    for compressed_file in files_to_extract:
+        if compressed_file not in stats:
+            print(f"⚠️ Compressed file not found: {compressed_file}")
+            continue
+        available_count += 1
+        
+        # Skip components already extracted from this version of the archive
+        output_stat = stats.get(compressed_file.replace('.gz', ''))
+        if output_stat and output_stat.st_mtime >= stats[compressed_file].st_mtime:
+            print(f"⏭️ {compressed_file} already extracted")
+        else:
+            pending.append(compressed_file)
+    
+    # Each archive is independent and zlib releases the GIL while inflating
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(extract, pending))
+    
+    print(f"🎉 Extracted {len(pending)} shapefile components ({available_count - len(pending)} up to date)")
+    return available_count > 0